@@ -1,29 +1,75 @@
 """
 This file enables using Ibis expressions inside Altair charts.
 
-To use it, import it and enable the `ibis` renderer and `ibis` data transformer,
-then pass an Ibis expression directly to `altair.Chart`.
+To use it, import it and call `install()`, which registers the `ibis` renderer
+and `ibis` data transformer and patches `altair.Chart` to accept an Ibis
+expression directly. `display_chart`, `interactive_chart`, and `get_display`
+call `install()` themselves. Importing this module is cheap: the heavy
+dependencies (ibis, altair, pandas) are only imported once a chart is actually
+rendered.
 """
+import collections
+import functools
+import hashlib
+import html
+import operator
 import pprint
-from copy import copy
+import uuid
+from copy import copy, deepcopy
 import typing
 
-import ibis
-import ibis.client
-import ipywidgets
+__all__ = ["display_chart", "interactive_chart", "get_display", "install"]
 
-import altair
-import pandas
-from altair.vegalite.v3.display import default_renderer
+# IPython is imported eagerly because the display classes below subclass its
+# display objects; everything heavier is imported on first use.
+from IPython.display import JSON, DisplayObject, display, Code, HTML, DisplayHandle
 
-__all__ = ["display_chart", "interactive_chart", "get_display"]
+if typing.TYPE_CHECKING:
+    import ibis
+    import ipykernel.comm
+    import ipywidgets
+    import pandas
+
+
+def _fast_to_json(data):
+    """
+    Drop-in replacement for `altair.utils.data.to_json` that serializes the
+    DataFrame through Arrow and orjson (both C-level) instead of pandas'
+    stdlib JSON encoder, returning the same url/format dict.
+    """
+    import orjson
+    import pyarrow
+
+    table = pyarrow.Table.from_pandas(data, preserve_index=False)
+    # to_pydict (unlike Table.to_pylist, added in pyarrow 7) exists across
+    # all pyarrow versions, including the old line pinned by pymapd.
+    columns = table.to_pydict()
+    records = [dict(zip(columns, row)) for row in zip(*columns.values())]
+    serialized = orjson.dumps(records, default=str)
+    filename = f"altair-data-{hashlib.md5(serialized).hexdigest()}.json"
+    with open(filename, "wb") as f:
+        f.write(serialized)
+    return {"url": filename, "format": {"type": "json"}}
 
-import ipykernel.comm
-from IPython.display import JSON, DisplayObject, display, Code, HTML, DisplayHandle
 
+# Data transformer to use in ibis renderer. Resolved lazily on first render;
+# assign a callable here to override it.
+DEFAULT_TRANSFORMER = None
 
-# Data transformer to use in ibis renderer
-DEFAULT_TRANSFORMER = altair.utils.data.to_json
+
+def _default_transformer():
+    global DEFAULT_TRANSFORMER
+    if DEFAULT_TRANSFORMER is None:
+        try:
+            import orjson  # noqa: F401
+            import pyarrow  # noqa: F401
+
+            DEFAULT_TRANSFORMER = _fast_to_json
+        except ImportError:
+            import altair
+
+            DEFAULT_TRANSFORMER = altair.utils.data.to_json
+    return DEFAULT_TRANSFORMER
 
 
 # A placeholder vega spec that will be replaced once the
@@ -37,7 +83,7 @@ COMM_ID = "extract-vega-lite"
 
 # Set this to the active output when we are rendering with ipywidgets.
 # We use this to get the output into the renderer, without having to pass it in explicitly.
-ACTIVE_OUTPUT: typing.Optional[ipywidgets.Output] = None
+ACTIVE_OUTPUT: typing.Optional["ipywidgets.Output"] = None
 DISPLAY_HANDLE: typing.Optional[display] = None
 
 
@@ -76,39 +122,48 @@ def ibis_renderer(spec, type="vl", extract=True, compile=True, **options):
         display_type = Code
         display_data = "Waiting for transformed spec..."
 
+    # Resolve the expressions for this render up front, so that asynchronous
+    # extraction callbacks don't depend on the registry still holding them.
+    exprs = {}
+    for view in spec_views(spec):
+        name = view.get("data", {}).get("name")
+        if name is not None:
+            exprs[name] = _name_to_ibis[name]
+
     def to_data(spec):
-        # if we should compile the expression, replace it with the updated
-        # version and mutate the spec
-        all_expressions = []
+        # One pass over the views: resolve each expression once, mutate the
+        # spec if we are compiling, and produce the artifact for this output
+        # type as we go instead of collecting expressions for a second loop.
+        first_expr = None
+        sql_statements = []
         for view in spec_views(spec):
             if "data" not in view:
                 continue
             # Retrieve the ibis expression based on the name of the data
-            expr = _name_to_ibis.pop(view["data"]["name"])
+            expr = exprs[view["data"]["name"]]
             # If we are compiling, update the spec based on the expression
             # and record the updated expression
             if compile:
                 expr = update_spec(expr, view)
-            # Save the resulting expression so we can access it for the SQL output.
-            all_expressions.append(expr)
+            if first_expr is None:
+                first_expr = expr
             # If we are compiling to vega lite, get the data and run
             # it through the default transformer (to_csv)
             if type == "vl":
-                view["data"] = DEFAULT_TRANSFORMER(expr.execute())
+                view["data"] = _default_transformer()(_execute_expr(expr))
             # If we are compiling to backend rendered vega
             # just record the SQL statement
             elif type == "vl-omnisci":
-                view["data"] = {"sql": expr.compile()}
-
-        if type == "vl":
-            return spec
-        elif type == "vl-omnisci":
-            return [spec, get_client(all_expressions[0])]
-        elif type == "json":
-            return spec
+                view["data"] = {"sql": _compile_expr(expr)}
+            elif type == "sql":
+                sql_statements.append(_compile_expr(expr))
+
+        if type == "vl-omnisci":
+            return [spec, get_client(first_expr)]
         elif type == "sql":
             # TODO: return mutiple
-            return "\n".join(expr.compile() for expr in all_expressions)
+            return "\n".join(sql_statements)
+        return spec
 
     def to_display(spec) -> DisplayObject:
         return display_type(to_data(spec))
@@ -153,7 +208,9 @@ def interactive_chart(f, controls):
     Like `ipywidgets.interactive_output` but should return Altair chart and supports
     async altair rendering.
     """
+    import ipywidgets
 
+    install()
     out = ipywidgets.Output()
 
     def observer(change, out=out):
@@ -177,6 +234,7 @@ def get_display(f, *args, display_handle=True, **kwargs):
     Usage:
         chart_handle = jupyterlab_omnisci.get_display(render_chart, *args)
     """
+    install()
 
     global DISPLAY_HANDLE
 
@@ -209,6 +267,8 @@ class VegaLiteOmniSci(DisplayObject):
 
 class VegaLite(DisplayObject):
     def _repr_mimebundle_(self, include, exclude):
+        from altair.vegalite.v3.display import default_renderer
+
         return default_renderer(self.data, **self.metadata)
 
 
@@ -219,7 +279,16 @@ class CompatJSON(JSON):
     """
 
     def _repr_html_(self):
-        return "<pre>" + pprint.pformat(self.data, width=120) + "</pre>"
+        # pprint is a pure-Python walk whose cost blows up on specs with
+        # large embedded data; prefer orjson's C-level serializer.
+        try:
+            import orjson
+        except ImportError:
+            return "<pre>" + pprint.pformat(self.data, width=120) + "</pre>"
+        text = orjson.dumps(
+            self.data, option=orjson.OPT_INDENT_2, default=str
+        ).decode()
+        return "<pre>" + html.escape(text) + "</pre>"
 
 
 ##
@@ -227,15 +296,74 @@ class CompatJSON(JSON):
 ##
 
 
+# The comm used for extract requests. Opened lazily and reused for the rest
+# of the current top-level execution, so a render pass issues one comm-open
+# handshake however many requests it multiplexes. It is NOT kept across
+# executions: a browser page reload silently drops the frontend's comm table
+# without ever sending comm_close, so a longer-lived comm could never tell it
+# was talking to nobody.
+_EXTRACT_COMM: typing.Optional["ipykernel.comm.Comm"] = None
+_COMM_RESET_REGISTERED = False
+
+# Callbacks for in-flight extract requests, keyed by request id. Bounded so
+# requests whose replies never arrive can't accumulate over a session.
+_pending_extracts: typing.Dict[str, typing.Callable] = {}
+_PENDING_EXTRACTS_SIZE = 256
+
+
+def _reset_extract_comm():
+    global _EXTRACT_COMM
+    _EXTRACT_COMM = None
+
+
+def _get_extract_comm():
+    import ipykernel.comm
+
+    global _EXTRACT_COMM, _COMM_RESET_REGISTERED
+    if not _COMM_RESET_REGISTERED:
+        try:
+            get_ipython().events.register("pre_execute", _reset_extract_comm)  # noqa: F821
+            _COMM_RESET_REGISTERED = True
+        except Exception:
+            pass
+    if _EXTRACT_COMM is None:
+        comm = ipykernel.comm.Comm(target_name=COMM_ID)
+
+        @comm.on_msg
+        def _recv(msg):
+            data = msg["content"]["data"]
+            callback = _pending_extracts.pop(data["req_id"], None)
+            if callback is not None:
+                callback(data["spec"])
+
+        @comm.on_close
+        def _close(msg):
+            # The frontend actively closed the comm (e.g. no handler was
+            # registered for the target yet); reopen on the next request.
+            _reset_extract_comm()
+
+        _EXTRACT_COMM = comm
+    return _EXTRACT_COMM
+
+
 def extract_spec(spec, callback):
     """
     Calls extract_transform on the frontend and calls the callback with the transformed spec.
+
+    All requests are multiplexed over a single persistent comm, tagged with a
+    request id so the responses can be routed back to the right callback.
     """
-    my_comm = ipykernel.comm.Comm(target_name=COMM_ID, data=spec)
+    req_id = uuid.uuid4().hex
+    _pending_extracts[req_id] = callback
+    while len(_pending_extracts) > _PENDING_EXTRACTS_SIZE:
+        del _pending_extracts[next(iter(_pending_extracts))]
+    _get_extract_comm().send({"req_id": req_id, "spec": spec})
 
-    @my_comm.on_msg
-    def _recv(msg):
-        callback(msg["content"]["data"])
+
+# Zero-row DataFrames with dtypes applied, keyed by expression schema.
+# Applying a schema walks it and re-assigns dtypes, so we only do that once
+# per distinct schema and hand out shallow copies afterwards.
+_EMPTY_CACHE: typing.Dict[typing.Any, "pandas.DataFrame"] = {}
 
 
 def empty(expr):
@@ -244,18 +372,73 @@ def empty(expr):
 
     https://github.com/ibis-project/ibis/issues/1676#issuecomment-441472528
     """
-    return expr.schema().apply_to(pandas.DataFrame(columns=expr.columns))
+    import pandas
+
+    key = tuple(expr.schema().items())
+    df = _EMPTY_CACHE.get(key)
+    if df is None:
+        df = expr.schema().apply_to(pandas.DataFrame(columns=expr.columns))
+        _EMPTY_CACHE[key] = df
+    # Shallow copy so per-chart attributes (like `ibis`) don't leak into the
+    # cached template.
+    return df.copy(deep=False)
 
 
 def get_client(expr):
     return expr.op().table.op().source
 
 
+# Compiled SQL for recently rendered expressions, keyed by the expression's
+# operator tree. Compilation is deterministic, so this memo can safely
+# persist across renders; it is sized to cover the re-extractions the
+# frontend issues on every interaction.
+_SQL_CACHE: typing.Dict[str, str] = {}
+_SQL_CACHE_SIZE = 128
+
+# Executed results, active only while a display_chart pass is rendering its
+# variants so they share one database round-trip. It is dropped at the end of
+# the pass: results come from live tables, and holding them any longer would
+# silently render stale rows after the data changes.
+_RESULT_CACHE: typing.Optional[typing.Dict[str, "pandas.DataFrame"]] = None
+
+
+def _compile_expr(expr):
+    """
+    `expr.compile()`, memoized on the expression's operator tree.
+    """
+    key = repr(expr.op())
+    sql = _SQL_CACHE.get(key)
+    if sql is None:
+        sql = expr.compile()
+        _SQL_CACHE[key] = sql
+        while len(_SQL_CACHE) > _SQL_CACHE_SIZE:
+            del _SQL_CACHE[next(iter(_SQL_CACHE))]
+    return sql
+
+
+def _execute_expr(expr):
+    """
+    `expr.execute()`, memoized on the expression's operator tree while a
+    display_chart pass is active.
+    """
+    if _RESULT_CACHE is None:
+        return expr.execute()
+    key = repr(expr.op())
+    df = _RESULT_CACHE.get(key)
+    if df is None:
+        df = expr.execute()
+        _RESULT_CACHE[key] = df
+    return df
+
+
 def monkeypatch_altair():
     """
     Needed until https://github.com/altair-viz/altair/issues/843 is fixed to let Altair
     handle ibis inputs
     """
+    import altair
+    import ibis
+
     original_chart_init = altair.Chart.__init__
 
     def updated_chart_init(self, data=None, *args, **kwargs):
@@ -274,8 +457,11 @@ def monkeypatch_altair():
 
 
 _i = 0
-# Mapping from data name to ibis expression
-_name_to_ibis = {}
+# Mapping from data name to ibis expression. Bounded so charts that are
+# serialized but never rendered (and therefore never cleaned up) can't grow
+# it without limit over a long notebook session.
+_name_to_ibis: typing.MutableMapping[str, "ibis.Expr"] = collections.OrderedDict()
+_NAME_TO_IBIS_SIZE = 256
 
 
 def spec_views(spec):
@@ -302,18 +488,35 @@ def ibis_transformation(data):
     (because of how Altair is set up), we create a unique name and
     save the ibis expression globally with that name so we can pick it up later.
     """
+    import pandas
+
     assert isinstance(data, pandas.DataFrame)
     global _i
     name = f"ibis_{_i}"
     _i += 1
     _name_to_ibis[name] = data.ibis
+    while len(_name_to_ibis) > _NAME_TO_IBIS_SIZE:
+        _name_to_ibis.popitem(last=False)
     return {"name": name}
 
 
+@functools.lru_cache(maxsize=None)
 def translate_op(op):
     return {"mean": "mean", "average": "mean"}.get(op, op)
 
 
+# Vega Lite field predicates we can translate to an Ibis comparison:
+# https://vega.github.io/vega-lite/docs/filter.html#field-predicate
+# `range` is handled separately since it produces two predicates.
+_FILTER_OPS = {
+    "equal": operator.eq,
+    "gt": operator.gt,
+    "lt": operator.lt,
+    "lte": operator.le,
+    "gte": operator.ge,
+}
+
+
 def vl_aggregate_to_grouping_expr(expr, a):
     if "field" in a:
         expr = expr[a["field"]]
@@ -327,62 +530,87 @@ def update_spec(expr, spec):
     Takes in an ibis expression and a spec, updating the spec and returning a new ibis expr
     """
     original_expr = expr
+    # Columns are a list on Ibis expressions, so membership tests are linear
+    # scans; keep a set in sync with `expr` for the groupby validation below.
+    columns = frozenset(expr.columns)
+    transforms = spec.get("transform", [])
+    # Filter predicates accumulated across transforms. They are applied in a
+    # single .filter() call so stacked filter transforms produce one Ibis
+    # selection node instead of one per transform.
+    pending_filters = []
 
     # iterate through transforms and move as many as we can into the ibis expression
     # logic modified from
     # https://github.com/vega/vega-lite-transforms2sql/blob/3b360144305a6cec79792036049e8a920e4d2c9e/transforms2sql.ts#L7
-    for transform in spec.get("transform", []):
+    for transform in transforms:
         groupby = transform.pop("groupby", None)
+        aggregate = transform.pop("aggregate", None)
+        if groupby and not columns.issuperset(groupby):
+            # we referenced a field that isnt in the expression because it was an aggregate we coudnt process
+            transform["groupby"] = groupby
+            if aggregate:
+                transform["aggregate"] = aggregate
+            continue
+
+        if (groupby or aggregate) and pending_filters:
+            # An aggregation forces the accumulated filters to apply first.
+            expr = expr.filter(pending_filters)
+            pending_filters = []
         if groupby:
-            all_fields_exist = all([field in expr.columns for field in groupby])
-            if not all_fields_exist:
-                transform["groupby"] = groupby
-                # we referenced a field that isnt in the expression because it was an aggregate we coudnt process
-                continue
             expr = expr.groupby(groupby)
-
-        aggregate = transform.pop("aggregate", None)
         if aggregate:
             expr = expr.aggregate(
                 [vl_aggregate_to_grouping_expr(original_expr, a) for a in aggregate]
             )
+            columns = frozenset(expr.columns)
 
         filter_ = transform.pop("filter", None)
         if filter_:
-            # https://vega.github.io/vega-lite/docs/filter.html#field-predicate
-            field = filter_["field"]
-            field_expr = original_expr[field]
+            field_expr = original_expr[filter_["field"]]
             if "range" in filter_:
                 min, max = filter_["range"]
-                preds = [field_expr >= min, field_expr <= max]
-            elif "equal" in filter_:
-                preds = [field_expr == filter_["equal"]]
-            elif "gt" in filter_:
-                preds = [field_expr > filter_["gt"]]
-            elif "lt" in filter_:
-                preds = [field_expr < filter_["lt"]]
-            elif "lte" in filter_:
-                preds = [field_expr <= filter_["lte"]]
-            elif "gte" in filter_:
-                preds = [field_expr >= filter_["gte"]]
+                pending_filters.extend([field_expr >= min, field_expr <= max])
             else:
-                # put filter back if we cant transform itt
-                transform["filter"] = filter_
-                continue
-            expr = expr.filter(preds)
+                key = next((k for k in _FILTER_OPS if k in filter_), None)
+                if key is None:
+                    # put filter back if we cant transform itt
+                    transform["filter"] = filter_
+                    continue
+                pending_filters.append(_FILTER_OPS[key](field_expr, filter_[key]))
+
+    if pending_filters:
+        expr = expr.filter(pending_filters)
 
     # remove empty transforms
-    spec["transform"] = [i for i in spec.get("transform", []) if i]
+    remaining = [i for i in transforms if i]
+    if remaining:
+        spec["transform"] = remaining
     # remove key if empty
-    if not spec["transform"]:
+    elif "transform" in spec:
         del spec["transform"]
 
     return expr
 
 
-altair.renderers.register("ibis", ibis_renderer)
-altair.data_transformers.register("ibis", ibis_transformation)
-monkeypatch_altair()
+_INSTALLED = False
+
+
+def install():
+    """
+    Registers the `ibis` renderer and data transformer with Altair and patches
+    `altair.Chart` to accept Ibis expressions. Idempotent; called on first use
+    by the display helpers, so only notebooks that drive the renderer purely
+    through `altair.renderers.enable` need to call it themselves.
+    """
+    global _INSTALLED
+    if _INSTALLED:
+        return
+    import altair
+
+    altair.renderers.register("ibis", ibis_renderer)
+    altair.data_transformers.register("ibis", ibis_transformation)
+    monkeypatch_altair()
+    _INSTALLED = True
 
 
 def display_chart(chart, backend_render=False):
@@ -399,37 +627,59 @@ def display_chart(chart, backend_render=False):
 
     backend_render: Whether to also render with OmniSci's builtin Vega rendering.
     """
+    install()
+    # Serialize the chart once; re-displaying the chart through Altair would
+    # re-run the data transformer and re-serialize the spec for every variant.
+    # The renderer mutates the spec in place, so each variant gets its own copy.
+    spec = chart.to_dict()
+    data_names = [
+        view["data"]["name"]
+        for view in spec_views(spec)
+        if "name" in view.get("data", {})
+    ]
 
     def display_header(name):
         display(HTML(f"<h3>{name}</h3>"))
 
     def display_render(compile, extract, type):
-        altair.renderers.enable("ibis", compile=compile, extract=extract, type=type)
         method = f'altair.renderers.enable("ibis", compile={compile}, extract={extract}, type={repr(type)})'
         display(HTML(f"<strong><code>{method}</code></strong>"))
-        display(chart)
-
-    display_header("Initial")
-    display_render(False, False, "json")
-    display_render(False, False, "sql")
-    display_render(False, False, "vl")
-    if backend_render:
-        display_render(False, False, "vl-omnisci")
-
-    display_header("Compiled")
-    display_render(True, False, "json")
-    display_render(True, False, "sql")
-    display_render(True, False, "vl")
-    if backend_render:
-        display_render(False, False, "vl-omnisci")
-
-    display_header("Extracted")
-    display_render(False, True, "json")
-    display_render(False, True, "vl")
-
-    display_header("Extracted then Compiled")
-    display_render(True, True, "json")
-    display_render(True, True, "sql")
-    display_render(True, True, "vl")
-    if backend_render:
-        display_render(False, False, "vl-omnisci")
+        display(
+            ibis_renderer(deepcopy(spec), type=type, extract=extract, compile=compile),
+            raw=True,
+        )
+
+    global _RESULT_CACHE
+    _RESULT_CACHE = {}
+    try:
+        display_header("Initial")
+        display_render(False, False, "json")
+        display_render(False, False, "sql")
+        display_render(False, False, "vl")
+        if backend_render:
+            display_render(False, False, "vl-omnisci")
+
+        display_header("Compiled")
+        display_render(True, False, "json")
+        display_render(True, False, "sql")
+        display_render(True, False, "vl")
+        if backend_render:
+            display_render(False, False, "vl-omnisci")
+
+        display_header("Extracted")
+        display_render(False, True, "json")
+        display_render(False, True, "vl")
+
+        display_header("Extracted then Compiled")
+        display_render(True, True, "json")
+        display_render(True, True, "sql")
+        display_render(True, True, "vl")
+        if backend_render:
+            display_render(False, False, "vl-omnisci")
+    finally:
+        # The expressions were registered when the chart was serialized; drop
+        # them now that every variant has captured what it needs. Cached
+        # results go too, so the next render re-queries the live tables.
+        _RESULT_CACHE = None
+        for name in data_names:
+            _name_to_ibis.pop(name, None)
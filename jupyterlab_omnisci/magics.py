@@ -4,12 +4,8 @@ Vega Lite and Vega in the MapD server and for rendering a SQL editor given a que
 """
 
 import ast
-import yaml
 import urllib.parse
 
-import ibis
-import pymapd
-
 __all__ = ["OmniSciVegaRenderer", "OmniSciSQLEditorRenderer"]
 
 from IPython.core.magic import register_cell_magic
@@ -126,6 +122,8 @@ def omnisci_vega(line, cell):
     data for the OmniSci server. The rest of the cell should be yaml-specified
     vega data.
     """
+    import yaml
+
     connection_data = ast.literal_eval(line)
     vega = yaml.safe_load(cell)
     display(OmniSciVegaRenderer(connection_data, vega))
@@ -141,6 +139,8 @@ def omnisci_vegalite(line, cell):
     data for the OmniSci server. The rest of the cell should be yaml-specified
     vega lite data.
     """
+    import yaml
+
     connection_data = ast.literal_eval(line)
     vl = yaml.safe_load(cell)
     display(OmniSciVegaRenderer(connection_data, vl_data=vl))
@@ -179,6 +179,9 @@ def _make_connection(connection):
         if available. If the session id is not available (for instance, if
         a dict is provided), then returns None for the second item.
     """
+    import ibis
+    import pymapd
+
     if isinstance(connection, ibis.mapd.MapDClient):
         con = dict(
             host=connection.host,
@@ -26,9 +26,13 @@ export default plugin;
 const COMM_TARGET = 'extract-vega-lite';
 
 function commTarget(comm: Kernel.IComm, msg: KernelMessage.ICommOpenMsg) {
-  const spec: any = msg.content.data;
-  const extractedSpec = extractTransforms(spec, {});
-  comm.send(extractedSpec as any);
+  // The kernel keeps a single comm open and multiplexes extract requests
+  // over it, tagging each one with a request id that we echo back.
+  comm.onMsg = (msg: KernelMessage.ICommMsgMsg) => {
+    const data: any = msg.content.data;
+    const extractedSpec = extractTransforms(data.spec, {});
+    comm.send({ req_id: data.req_id, spec: extractedSpec } as any);
+  };
 }
 function createNew(
   nb: NotebookPanel,